@@ -1,11 +1,108 @@
 import os
 import sys
+import ast
+import bisect
+import fnmatch
 import json
+import re
 import datetime
+import functools
+import itertools
 import subprocess
 import shutil
+import stat
+import time
+from collections import deque
 from pathlib import Path
 import argparse
+import atexit
+
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps(data):
+        return orjson.dumps(data)
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(data):
+        return json.dumps(data, separators=(',', ':')).encode()
+
+# Units for format_bytes and the byte counts at which each one takes over
+_BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+_BYTE_THRESHOLDS = (1024, 1024**2, 1024**3, 1024**4)
+
+# History log size past which a flush rewrites it with the last 100 entries;
+# about twice the size of 100 typical entries (~60 bytes each)
+_HISTORY_TRIM_BYTES = 12 * 1024
+
+# Unit conversions as (from, to) -> (factor, offset, from_symbol, to_symbol),
+# applied as value * factor + offset; inverses are derived below
+_CONVERSIONS = {
+    ('celsius', 'fahrenheit'): (9/5, 32, '°C', '°F'),
+    ('kg', 'lbs'): (2.20462, 0, ' kg', ' lbs'),
+    ('m', 'ft'): (3.28084, 0, ' m', ' ft'),
+    ('km', 'miles'): (0.621371, 0, ' km', ' miles'),
+}
+_CONVERSIONS.update({
+    (to_unit, from_unit): (1 / factor, -offset / factor, to_symbol, from_symbol)
+    for (from_unit, to_unit), (factor, offset, from_symbol, to_symbol) in list(_CONVERSIONS.items())
+})
+
+def _trigrams(text):
+    """Return the set of three-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# AST nodes permitted in calculator expressions
+_CALC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub,
+)
+
+# Largest integer power, in bits, that calculator expressions may produce
+_CALC_MAX_POWER_BITS = 1_000_000
+
+def _calc_pow(base, exponent):
+    """'**' for calculator expressions, refusing integer powers that would be huge"""
+    if (type(base) is int and type(exponent) is int and exponent > 0
+            and abs(base) > 1 and abs(base).bit_length() * exponent > _CALC_MAX_POWER_BITS):
+        raise ValueError("result is too large")
+    return base ** exponent
+
+def _validate_expr(tree):
+    """Reject any node that is not plain arithmetic on numbers"""
+    for node in ast.walk(tree):
+        if not isinstance(node, _CALC_NODES):
+            raise ValueError("Only basic math operations allowed")
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float):
+            raise ValueError("Only basic math operations allowed")
+
+class _GuardPowers(ast.NodeTransformer):
+    """Route every '**' in a validated expression through _calc_pow"""
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            call = ast.Call(ast.Name('_calc_pow', ast.Load()), [node.left, node.right], [])
+            return ast.copy_location(call, node)
+        return node
+
+@functools.lru_cache(maxsize=256)
+def _compile_expr(expression):
+    """Parse, validate and compile an expression, caching the code object"""
+    tree = ast.parse(expression.strip(), mode='eval')
+    _validate_expr(tree)
+    tree = ast.fix_missing_locations(_GuardPowers().visit(tree))
+    return compile(tree, '<calc>', 'eval')
+
+@functools.lru_cache(maxsize=1)
+def _disk_usage(time_bucket):
+    """Disk usage of the root filesystem, reused until time_bucket changes"""
+    return shutil.disk_usage('/')
 
 class CLIAssistant:
     def __init__(self):
@@ -27,45 +124,203 @@ class CLIAssistant:
             'quit': self.exit_assistant,
         }
         
-        self.data_dir = Path.home() / '.cli_assistant'
+        self.note_actions = {
+            'add': self.note_add,
+            'list': self.note_list,
+            'delete': self.note_delete,
+            'search': self.note_search,
+        }
+        self.todo_actions = {
+            'add': self.todo_add,
+            'list': self.todo_list,
+            'done': self.todo_done,
+            'delete': self.todo_delete,
+        }
+        self.file_actions = {
+            'ls': self.files_ls,
+            'find': self.search_files,
+            'size': self.files_size,
+        }
+        
+        self.home_dir = Path.home()
+        self.data_dir = self.home_dir / '.cli_assistant'
         self.data_dir.mkdir(exist_ok=True)
-        self.notes_file = self.data_dir / 'notes.json'
-        self.todos_file = self.data_dir / 'todos.json'
-        self.history_file = self.data_dir / 'history.json'
+        self.notes_file = self.data_dir / 'notes.jsonl'
+        self.todos_file = self.data_dir / 'todos.jsonl'
+        self.history_file = self.data_dir / 'history.jsonl'
+        
+        # Set by run(); one-shot commands skip building in-memory indexes
+        self.interactive = False
         
-        self.load_data()
+        # Commands run this session that have not been written to history_file
+        self._pending_history = []
+        atexit.register(self.flush_history)
         
-    def load_data(self):
-        """Load persistent data from files"""
-        self.notes = self.load_json(self.notes_file, {})
-        self.todos = self.load_json(self.todos_file, [])
-        self.history = self.load_json(self.history_file, [])
+    # Persistent data is loaded on first access, so commands that never
+    # touch it skip reading and parsing the data files
+    @functools.cached_property
+    def notes(self):
+        """Notes keyed by title"""
+        return self.load_log(self.notes_file, {}, self.apply_note_record, self.note_records)
+        
+    @functools.cached_property
+    def todos(self):
+        """Todo items in list order"""
+        return self.load_log(self.todos_file, [], self.apply_todo_record, self.todo_records)
+        
+    @functools.cached_property
+    def history(self):
+        """The last 100 recorded commands, oldest first"""
+        if not self.history_file.exists():
+            self.migrate_legacy_history()
+        records = self.load_jsonl(self.history_file)
+        self._history_lines = len(records)
+        history = deque(records, maxlen=100)
+        history.extend(self._pending_history)
+        return history
+        
+    def migrate_legacy_history(self):
+        """Seed the history log from a history.json left by older versions"""
+        legacy_file = self.history_file.with_suffix('.json')
+        if legacy_file.exists():
+            records = self.load_json(legacy_file, [])
+            if isinstance(records, list):
+                self.save_jsonl(self.history_file, records[-100:])
+                
+    def load_log(self, file_path, state, apply_record, snapshot):
+        """Replay an operation log into state, compacting it when mostly stale"""
+        if not file_path.exists():
+            # Carry over data saved by versions that rewrote a whole .json file
+            legacy_file = file_path.with_suffix('.json')
+            if legacy_file.exists():
+                state = self.load_json(legacy_file, state)
+                self.save_jsonl(file_path, snapshot(state))
+            return state
+            
+        records = self.load_jsonl(file_path)
+        for record in records:
+            try:
+                apply_record(state, record)
+            except (KeyError, IndexError, TypeError):
+                pass
+        # Rewrite the log as one 'add' per live entry once stale lines dominate
+        if len(records) > 2 * len(state):
+            self.save_jsonl(file_path, snapshot(state))
+        return state
+        
+    def apply_note_record(self, notes, record):
+        """Apply one notes log record"""
+        if record['op'] == 'add':
+            notes[record['title']] = {k: v for k, v in record.items() if k not in ('op', 'title')}
+        elif record['op'] == 'del':
+            notes.pop(record['title'], None)
+            
+    def note_records(self, notes):
+        """Log records that recreate the given notes"""
+        return [{'op': 'add', 'title': title, **note} for title, note in notes.items()]
+        
+    def apply_todo_record(self, todos, record):
+        """Apply one todos log record"""
+        if record['op'] == 'add':
+            todos.append({k: v for k, v in record.items() if k != 'op'})
+        elif record['op'] == 'done':
+            todos[record['index']]['done'] = True
+        elif record['op'] == 'del':
+            del todos[record['index']]
+            
+    def todo_records(self, todos):
+        """Log records that recreate the given todos"""
+        return [{'op': 'add', **todo} for todo in todos]
         
     def load_json(self, file_path, default):
         """Load JSON data from file with error handling"""
         try:
             if file_path.exists():
-                with open(file_path, 'r') as f:
-                    return json.load(f)
-        except (json.JSONDecodeError, IOError):
+                with open(file_path, 'rb') as f:
+                    return _json_loads(f.read())
+        except (ValueError, IOError):
             pass
         return default
         
-    def save_json(self, file_path, data):
-        """Save JSON data to file"""
+    def load_jsonl(self, file_path):
+        """Load a list of records from a JSON Lines file, skipping bad lines"""
+        records = []
         try:
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            if file_path.exists():
+                with open(file_path, 'rb', buffering=65536) as f:
+                    for line in f:
+                        try:
+                            records.append(_json_loads(line))
+                        except ValueError:
+                            pass
+        except IOError:
+            pass
+        return records
+        
+    def append_jsonl(self, file_path, *records):
+        """Append records to a JSON Lines file"""
+        try:
+            with open(file_path, 'ab') as f:
+                f.writelines(_json_dumps(record) + b'\n' for record in records)
+        except IOError as e:
+            print(f"Error saving data: {e}")
+            
+    def save_jsonl(self, file_path, records):
+        """Rewrite a JSON Lines file with the given records"""
+        try:
+            with open(file_path, 'wb') as f:
+                f.writelines(_json_dumps(record) + b'\n' for record in records)
         except IOError as e:
             print(f"Error saving data: {e}")
             
     def add_to_history(self, command):
         """Add command to history"""
-        timestamp = datetime.datetime.now().isoformat()
-        self.history.append({'command': command, 'timestamp': timestamp})
-        # Keep only last 100 commands
-        self.history = self.history[-100:]
-        self.save_json(self.history_file, self.history)
+        entry = {'command': command, 'ts': time.time()}
+        # Written out by flush_history; only update history if already loaded
+        self._pending_history.append(entry)
+        if 'history' in self.__dict__:
+            self.history.append(entry)
+            
+    def flush_history(self):
+        """Write this session's commands to the history file"""
+        if not self._pending_history:
+            return
+        loaded = 'history' in self.__dict__
+        if loaded:
+            # Once the log has doubled, rewrite it with only the last 100 commands
+            rotate = self._history_lines + len(self._pending_history) > 200
+        else:
+            if not self.history_file.exists():
+                self.migrate_legacy_history()
+            # Judge an unloaded log by its size alone, so a flush never reads it
+            # unless it is due for a rewrite
+            try:
+                rotate = self.history_file.stat().st_size > _HISTORY_TRIM_BYTES
+            except OSError:
+                rotate = False
+        if rotate:
+            self.save_jsonl(self.history_file, self.history)
+            self._history_lines = len(self.history)
+        else:
+            self.append_jsonl(self.history_file, *self._pending_history)
+            if loaded:
+                self._history_lines += len(self._pending_history)
+        self._pending_history = []
+        
+    def format_timestamp(self, record):
+        """Format a record's time for display, accepting older ISO timestamps"""
+        ts = record.get('ts')
+        if isinstance(ts, (int, float)):
+            try:
+                return datetime.datetime.fromtimestamp(ts).isoformat(timespec='seconds')
+            except (OverflowError, OSError, ValueError):
+                return ''
+        return str(record.get('timestamp', ''))[:19]
+        
+    def history_entries(self):
+        """History records usable for display, skipping malformed lines"""
+        return [entry for entry in self.history
+                if isinstance(entry, dict) and isinstance(entry.get('command'), str)]
         
     def show_help(self, args=None):
         """Display help information"""
@@ -126,186 +381,288 @@ Usage Examples:
             
         expression = ' '.join(args)
         try:
-            # Simple validation - only allow basic math operations
-            allowed_chars = set('0123456789+-*/.() ')
-            if not all(c in allowed_chars for c in expression):
-                print("Error: Only basic math operations allowed")
-                return
-                
-            result = eval(expression)
+            code = _compile_expr(expression)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        except SyntaxError as e:
+            print(f"Error calculating: {e.msg}")
+            return
+        except (RecursionError, MemoryError):
+            print("Error calculating: expression is too deeply nested")
+            return
+            
+        try:
+            result = eval(code, {'__builtins__': {}, '_calc_pow': _calc_pow}, {})
             print(f"{expression} = {result}")
         except Exception as e:
             print(f"Error calculating: {e}")
             
     def note_manager(self, args):
         """Note management system"""
-        if not args:
+        handler = self.note_actions.get(args[0].lower()) if args else None
+        if handler is None:
             print("Usage: note <add|list|delete|search> [arguments]")
             return
-            
-        action = args[0].lower()
+        handler(args[1:])
         
-        if action == 'add':
-            if len(args) < 3:
-                print("Usage: note add <title> <content>")
-                return
-            title = args[1]
-            content = ' '.join(args[2:])
-            timestamp = datetime.datetime.now().isoformat()
-            self.notes[title] = {'content': content, 'timestamp': timestamp}
-            self.save_json(self.notes_file, self.notes)
-            print(f"Note '{title}' added successfully")
+    def note_add(self, args):
+        """Add or replace a note"""
+        if len(args) < 2:
+            print("Usage: note add <title> <content>")
+            return
+        title = args[0]
+        content = ' '.join(args[1:])
+        note = {'content': content, 'ts': time.time()}
+        if title in self.notes:
+            self.unindex_note(title)
+        self.notes[title] = note
+        self.index_note(title)
+        self.append_jsonl(self.notes_file, {'op': 'add', 'title': title, **note})
+        print(f"Note '{title}' added successfully")
+        
+    def note_list(self, args):
+        """List all notes"""
+        if not self.notes:
+            print("No notes found")
+            return
+        lines = []
+        for title, note in self.notes.items():
+            lines.append(f"\n{title}:")
+            lines.append(f"  {note['content']}")
+            lines.append(f"  Created: {self.format_timestamp(note)}")
+        sys.stdout.write('\n'.join(lines) + '\n')
             
-        elif action == 'list':
-            if not self.notes:
-                print("No notes found")
-                return
-            for title, note in self.notes.items():
+    def note_delete(self, args):
+        """Delete a note by title"""
+        if not args:
+            print("Usage: note delete <title>")
+            return
+        title = args[0]
+        if title in self.notes:
+            self.unindex_note(title)
+            if 'note_index' in self.__dict__:
+                del self.note_order[title]
+            del self.notes[title]
+            self.append_jsonl(self.notes_file, {'op': 'del', 'title': title})
+            print(f"Note '{title}' deleted")
+        else:
+            print(f"Note '{title}' not found")
+            
+    def note_search(self, args):
+        """Search notes by keyword"""
+        if not args:
+            print("Usage: note search <keyword>")
+            return
+        keyword = args[0].lower()
+        if self.interactive and len(keyword) >= 3:
+            # Only notes containing every trigram of the keyword can match;
+            # the index is built once per session, so a one-shot search scans
+            postings = sorted((self.note_index.get(gram, set()) for gram in _trigrams(keyword)), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            titles = sorted(candidates, key=self.note_order.__getitem__)
+        else:
+            titles = self.notes
+        found = False
+        for title in titles:
+            note = self.notes[title]
+            if keyword in title.lower() or keyword in note['content'].lower():
                 print(f"\n{title}:")
                 print(f"  {note['content']}")
-                print(f"  Created: {note['timestamp'][:19]}")
-                
-        elif action == 'delete':
-            if len(args) < 2:
-                print("Usage: note delete <title>")
-                return
-            title = args[1]
-            if title in self.notes:
-                del self.notes[title]
-                self.save_json(self.notes_file, self.notes)
-                print(f"Note '{title}' deleted")
-            else:
-                print(f"Note '{title}' not found")
-                
-        elif action == 'search':
-            if len(args) < 2:
-                print("Usage: note search <keyword>")
-                return
-            keyword = args[1].lower()
-            found = False
-            for title, note in self.notes.items():
-                if keyword in title.lower() or keyword in note['content'].lower():
-                    print(f"\n{title}:")
-                    print(f"  {note['content']}")
-                    found = True
-            if not found:
-                print("No notes found matching the keyword")
-                
+                found = True
+        if not found:
+            print("No notes found matching the keyword")
+            
+    def note_trigrams(self, title):
+        """Lowercase trigrams of a note's title and content"""
+        return _trigrams(title.lower()) | _trigrams(self.notes[title]['content'].lower())
+        
+    @functools.cached_property
+    def note_index(self):
+        """Trigram -> note titles index used by note search"""
+        # Insertion position of each note, so hits print in self.notes order
+        self.note_order = {title: i for i, title in enumerate(self.notes)}
+        self._note_positions = itertools.count(len(self.notes))
+        index = {}
+        for title in self.notes:
+            for gram in self.note_trigrams(title):
+                index.setdefault(gram, set()).add(title)
+        return index
+        
+    def index_note(self, title):
+        """Add a note to the search index, if it has been built"""
+        if 'note_index' not in self.__dict__:
+            return
+        if title not in self.note_order:
+            self.note_order[title] = next(self._note_positions)
+        for gram in self.note_trigrams(title):
+            self.note_index.setdefault(gram, set()).add(title)
+            
+    def unindex_note(self, title):
+        """Remove a note from the search index, if it has been built"""
+        if 'note_index' not in self.__dict__:
+            return
+        for gram in self.note_trigrams(title):
+            titles = self.note_index.get(gram)
+            if titles is not None:
+                titles.discard(title)
+                if not titles:
+                    del self.note_index[gram]
+            
     def todo_manager(self, args):
         """Todo list management"""
-        if not args:
+        handler = self.todo_actions.get(args[0].lower()) if args else None
+        if handler is None:
             print("Usage: todo <add|list|done|delete> [arguments]")
             return
-            
-        action = args[0].lower()
+        handler(args[1:])
         
-        if action == 'add':
-            if len(args) < 2:
-                print("Usage: todo add <task description>")
-                return
-            task = ' '.join(args[1:])
-            todo_item = {
-                'task': task,
-                'done': False,
-                'created': datetime.datetime.now().isoformat()
-            }
-            self.todos.append(todo_item)
-            self.save_json(self.todos_file, self.todos)
-            print(f"Todo added: {task}")
+    def todo_add(self, args):
+        """Add a todo"""
+        if not args:
+            print("Usage: todo add <task description>")
+            return
+        task = ' '.join(args)
+        todo_item = {
+            'task': task,
+            'done': False,
+            'ts': time.time()
+        }
+        self.todos.append(todo_item)
+        self.append_jsonl(self.todos_file, {'op': 'add', **todo_item})
+        print(f"Todo added: {task}")
+        
+    def todo_list(self, args):
+        """List all todos"""
+        if not self.todos:
+            print("No todos found")
+            return
+        lines = []
+        for i, todo in enumerate(self.todos, 1):
+            status = "✓" if todo['done'] else "○"
+            lines.append(f"{i}. {status} {todo['task']}")
+        sys.stdout.write('\n'.join(lines) + '\n')
+            
+    def todo_done(self, args):
+        """Mark a todo as done"""
+        if not args:
+            print("Usage: todo done <task_number>")
+            return
+        try:
+            task_num = int(args[0]) - 1
+            if 0 <= task_num < len(self.todos):
+                self.todos[task_num]['done'] = True
+                self.append_jsonl(self.todos_file, {'op': 'done', 'index': task_num})
+                print(f"Todo marked as done: {self.todos[task_num]['task']}")
+            else:
+                print("Invalid task number")
+        except ValueError:
+            print("Task number must be a number")
+            
+    def todo_delete(self, args):
+        """Delete a todo by number"""
+        if not args:
+            print("Usage: todo delete <task_number>")
+            return
+        try:
+            task_num = int(args[0]) - 1
+            if 0 <= task_num < len(self.todos):
+                deleted_task = self.todos.pop(task_num)
+                self.append_jsonl(self.todos_file, {'op': 'del', 'index': task_num})
+                print(f"Todo deleted: {deleted_task['task']}")
+            else:
+                print("Invalid task number")
+        except ValueError:
+            print("Task number must be a number")
             
-        elif action == 'list':
-            if not self.todos:
-                print("No todos found")
-                return
-            for i, todo in enumerate(self.todos, 1):
-                status = "✓" if todo['done'] else "○"
-                print(f"{i}. {status} {todo['task']}")
-                
-        elif action == 'done':
-            if len(args) < 2:
-                print("Usage: todo done <task_number>")
-                return
-            try:
-                task_num = int(args[1]) - 1
-                if 0 <= task_num < len(self.todos):
-                    self.todos[task_num]['done'] = True
-                    self.save_json(self.todos_file, self.todos)
-                    print(f"Todo marked as done: {self.todos[task_num]['task']}")
-                else:
-                    print("Invalid task number")
-            except ValueError:
-                print("Task number must be a number")
-                
-        elif action == 'delete':
-            if len(args) < 2:
-                print("Usage: todo delete <task_number>")
-                return
-            try:
-                task_num = int(args[1]) - 1
-                if 0 <= task_num < len(self.todos):
-                    deleted_task = self.todos.pop(task_num)
-                    self.save_json(self.todos_file, self.todos)
-                    print(f"Todo deleted: {deleted_task['task']}")
-                else:
-                    print("Invalid task number")
-            except ValueError:
-                print("Task number must be a number")
-                
     def file_operations(self, args):
         """File operations"""
-        if not args:
+        handler = self.file_actions.get(args[0].lower()) if args else None
+        if handler is None:
             print("Usage: files <ls|find|size> [path]")
             return
-            
-        action = args[0].lower()
+        handler(args[1:])
         
-        if action == 'ls':
-            path = Path(args[1]) if len(args) > 1 else Path.cwd()
-            try:
-                if path.is_dir():
-                    items = sorted(path.iterdir())
-                    for item in items:
-                        type_indicator = "/" if item.is_dir() else ""
-                        print(f"{item.name}{type_indicator}")
-                else:
-                    print(f"{path} is not a directory")
-            except PermissionError:
-                print(f"Permission denied: {path}")
-            except FileNotFoundError:
+    def files_ls(self, args):
+        """List a directory"""
+        path = Path(args[0]) if args else Path.cwd()
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+            lines = [f"{entry.name}/" if entry.is_dir() else entry.name for entry in entries]
+            if lines:
+                sys.stdout.write('\n'.join(lines) + '\n')
+        except NotADirectoryError:
+            print(f"{path} is not a directory")
+        except PermissionError:
+            print(f"Permission denied: {path}")
+        except FileNotFoundError:
+            print(f"Path not found: {path}")
+            
+    def files_size(self, args):
+        """Show the size of a file or directory"""
+        path = Path(args[0]) if args else Path.cwd()
+        try:
+            st = path.stat()
+            if stat.S_ISREG(st.st_mode):
+                print(f"{path.name}: {self.format_bytes(st.st_size)}")
+            elif stat.S_ISDIR(st.st_mode):
+                total_size = self.directory_size(path)
+                print(f"{path.name}/: {self.format_bytes(total_size)}")
+            else:
                 print(f"Path not found: {path}")
-                
-        elif action == 'size':
-            path = Path(args[1]) if len(args) > 1 else Path.cwd()
+        except PermissionError:
+            print(f"Permission denied: {path}")
+        except OSError:
+            # Missing paths, a file used as a directory, symlink loops, ...
+            print(f"Path not found: {path}")
+            
+    def walk_entries(self, path):
+        """Yield a DirEntry for everything below a directory"""
+        pending = [path]
+        while pending:
+            current = pending.pop()
             try:
-                if path.is_file():
-                    size = path.stat().st_size
-                    print(f"{path.name}: {self.format_bytes(size)}")
-                elif path.is_dir():
-                    total_size = sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
-                    print(f"{path.name}/: {self.format_bytes(total_size)}")
-                else:
-                    print(f"Path not found: {path}")
-            except PermissionError:
-                print(f"Permission denied: {path}")
+                it = os.scandir(current)
+            except OSError:
+                # Skip unreadable subdirectories, as rglob did
+                if current is path:
+                    raise
+                continue
+            with it:
+                for entry in it:
+                    # DirEntry caches its file type, so this costs no extra stat
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    yield entry
+                    
+    def directory_size(self, path):
+        """Sum the sizes of all files below a directory"""
+        total_size = 0
+        for entry in self.walk_entries(path):
+            try:
+                if entry.is_file():
+                    total_size += entry.stat().st_size
+            except OSError:
+                pass
+        return total_size
                 
     def format_bytes(self, bytes_size):
         """Format bytes in human readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes_size < 1024.0:
-                return f"{bytes_size:.1f} {unit}"
-            bytes_size /= 1024.0
-        return f"{bytes_size:.1f} TB"
+        i = bisect.bisect_right(_BYTE_THRESHOLDS, bytes_size)
+        return f"{bytes_size / (1024**i):.1f} {_BYTE_UNITS[i]}"
         
     def system_info(self, args=None):
         """Display system information"""
         print(f"Operating System: {os.name}")
         print(f"Python Version: {sys.version}")
         print(f"Current Directory: {os.getcwd()}")
-        print(f"Home Directory: {Path.home()}")
+        print(f"Home Directory: {self.home_dir}")
         
         # Disk usage
         try:
-            disk_usage = shutil.disk_usage('/')
+            # Refreshed at most every 5 seconds
+            disk_usage = _disk_usage(int(time.monotonic() // 5))
             total = disk_usage.total
             free = disk_usage.free
             used = total - free
@@ -322,86 +679,105 @@ Usage Examples:
             
         try:
             value = float(args[0])
-            from_unit = args[1].lower()
-            to_unit = args[2].lower()
-            
-            # Temperature conversions
-            if from_unit == 'celsius' and to_unit == 'fahrenheit':
-                result = (value * 9/5) + 32
-                print(f"{value}°C = {result:.2f}°F")
-            elif from_unit == 'fahrenheit' and to_unit == 'celsius':
-                result = (value - 32) * 5/9
-                print(f"{value}°F = {result:.2f}°C")
-                
-            # Weight conversions
-            elif from_unit == 'kg' and to_unit == 'lbs':
-                result = value * 2.20462
-                print(f"{value} kg = {result:.2f} lbs")
-            elif from_unit == 'lbs' and to_unit == 'kg':
-                result = value / 2.20462
-                print(f"{value} lbs = {result:.2f} kg")
-                
-            # Length conversions
-            elif from_unit == 'm' and to_unit == 'ft':
-                result = value * 3.28084
-                print(f"{value} m = {result:.2f} ft")
-            elif from_unit == 'ft' and to_unit == 'm':
-                result = value / 3.28084
-                print(f"{value} ft = {result:.2f} m")
-                
-            # Distance conversions
-            elif from_unit == 'km' and to_unit == 'miles':
-                result = value * 0.621371
-                print(f"{value} km = {result:.2f} miles")
-            elif from_unit == 'miles' and to_unit == 'km':
-                result = value / 0.621371
-                print(f"{value} miles = {result:.2f} km")
-            else:
-                print("Conversion not supported")
-                
         except ValueError:
             print("Invalid value. Please enter a number.")
+            return
             
+        conversion = _CONVERSIONS.get((args[1].lower(), args[2].lower()))
+        if conversion is None:
+            print("Conversion not supported")
+            return
+        factor, offset, from_symbol, to_symbol = conversion
+        result = value * factor + offset
+        print(f"{value}{from_symbol} = {result:.2f}{to_symbol}")
+        
     def search_files(self, args):
         """Search for files"""
+        args = list(args)
+        max_results = None
+        if '--max' in args:
+            i = args.index('--max')
+            try:
+                max_results = int(args[i + 1])
+            except (IndexError, ValueError):
+                print("--max must be followed by a number")
+                return
+            if max_results < 1:
+                print("--max must be followed by a positive number")
+                return
+            del args[i:i + 2]
+            
         if not args:
-            print("Usage: search <filename_pattern> [directory]")
+            print("Usage: search <filename_pattern> [directory] [--max N]")
             return
             
         pattern = args[0]
         directory = Path(args[1]) if len(args) > 1 else Path.cwd()
-        
+        if not directory.is_dir():
+            print(f"{directory} is not a directory")
+            return
+            
+        # Same wildcard semantics as the old rglob(f"*{pattern}*"), ignoring case
+        match_name = re.compile(fnmatch.translate(f"*{pattern}*"), re.IGNORECASE).match
+        limit = 20 if max_results is None else max_results
+        shown = []
+        hidden = 0
+        truncated = False
         try:
-            matches = list(directory.rglob(f"*{pattern}*"))
-            if matches:
-                print(f"Found {len(matches)} matches:")
-                for match in matches[:20]:  # Limit to first 20 results
-                    print(f"  {match}")
-                if len(matches) > 20:
-                    print(f"  ... and {len(matches) - 20} more")
-            else:
-                print("No matches found")
+            for entry in self.walk_entries(directory):
+                if not match_name(entry.name):
+                    continue
+                if len(shown) < limit:
+                    shown.append(entry.path)
+                elif max_results is None:
+                    # Without --max there is no total to report, so stop walking
+                    truncated = True
+                    break
+                else:
+                    hidden += 1
         except PermissionError:
             print(f"Permission denied: {directory}")
+            return
+            
+        if not shown and not hidden:
+            print("No matches found")
+            return
+        if truncated:
+            print(f"Showing first {limit} matches:")
+        else:
+            print(f"Found {len(shown) + hidden} matches:")
+        for match in shown:
+            print(f"  {match}")
+        if truncated:
+            print("  ... more matches not shown (use --max N to list more)")
+        elif hidden:
+            print(f"  ... and {hidden} more")
             
     def show_history(self, args=None):
         """Show command history"""
-        if not self.history:
+        entries = self.history_entries()
+        if not entries:
             print("No command history")
             return
             
         print("Recent commands:")
-        for i, entry in enumerate(self.history[-10:], 1):
-            timestamp = entry['timestamp'][:19]
-            print(f"{i:2d}. {entry['command']} ({timestamp})")
+        recent = entries[-10:]
+        for i, entry in enumerate(recent, 1):
+            print(f"{i:2d}. {entry['command']} ({self.format_timestamp(entry)})")
             
     def clear_screen(self, args=None):
         """Clear the screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        if os.name != 'nt' and sys.stdout.isatty():
+            # Clear screen and scrollback, then home the cursor, without a subprocess
+            sys.stdout.write('\x1b[2J\x1b[3J\x1b[H')
+            sys.stdout.flush()
+        else:
+            os.system('cls' if os.name == 'nt' else 'clear')
         
     def exit_assistant(self, args=None):
         """Exit the assistant"""
         print("Goodbye!")
+        self.flush_history()
         sys.exit(0)
         
     def parse_command(self, command_line):
@@ -413,27 +789,46 @@ Usage Examples:
         
     def execute_command(self, command, args):
         """Execute a command"""
-        if command in self.commands:
-            self.add_to_history(f"{command} {' '.join(args)}")
-            self.commands[command](args)
-        else:
+        handler = self.commands.get(command)
+        if handler is None:
             print(f"Unknown command: {command}")
             print("Type 'help' for available commands")
+            return
+        self.add_to_history(f"{command} {' '.join(args)}" if args else command)
+        handler(args)
+            
+    def setup_readline(self):
+        """Enable line editing, with arrow-key recall of earlier commands"""
+        try:
+            import readline
+        except ImportError:
+            return
+        # The JSON Lines history stays the single store; readline is only seeded
+        # from it, and the length cap matches the 100 commands it keeps
+        readline.set_history_length(100)
+        for entry in self.history_entries():
+            readline.add_history(entry['command'])
             
     def run(self):
         """Main interactive loop"""
         print("Welcome to CLI Assistant!")
         print("Type 'help' for available commands or 'exit' to quit.")
         
+        self.interactive = True
+        self.setup_readline()
+        
+        # Bound once so the loop does not repeat the attribute lookups
+        parse_command = self.parse_command
+        execute_command = self.execute_command
         while True:
             try:
                 command_line = input("\n> ").strip()
                 if not command_line:
                     continue
                     
-                command, args = self.parse_command(command_line)
+                command, args = parse_command(command_line)
                 if command:
-                    self.execute_command(command, args)
+                    execute_command(command, args)
                     
             except KeyboardInterrupt:
                 print("\nExiting...")
@@ -441,11 +836,13 @@ Usage Examples:
             except EOFError:
                 print("\nExiting...")
                 break
+                
+        self.flush_history()
 
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description='CLI Assistant')
-    parser.add_argument('command', nargs='*', help='Command to execute')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='Command to execute')
     
     args = parser.parse_args()
     